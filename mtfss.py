@@ -7,21 +7,245 @@ A Python script that automatically organizes emails into folders based on recipi
 import argparse
 import email
 import email.message
+import json
 import logging
 import os
+import queue
 import re
+import select
+import ssl
 import sys
+import threading
 import time
+from email.utils import getaddresses
 from imaplib import IMAP4, IMAP4_SSL
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
 
 ARCHIVE_FOLDER = "archived"
+STATE_FILE = os.path.join(os.path.expanduser("~"), ".mtfss-state.json")
+
+# The log format uses no thread or process details, so skip collecting them
+# for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+# Messages requested per FETCH; returns diminish well before RFC 2683's
+# suggested ceiling of 1000
+_FETCH_BATCH = 100
+# Fetched batches buffered ahead of routing, bounding memory use
+_FETCH_QUEUE_SIZE = 4
+# Queued by the fetch thread once it has nothing more to deliver
+_END_OF_FETCH = object()
+# Characters only found in addresses needing a full RFC 5322 parse:
+# quoted strings, comments, group syntax, domain literals and escapes
+_ADDRESS_SPECIALS = b'"()[]\\:;'
+# UID of a message in a FETCH response envelope
+_UID_RE = re.compile(rb'\bUID (\d+)')
+# Only the routing headers are needed; PEEK leaves the \Seen flag untouched
+_FETCH_ITEMS = '(BODY.PEEK[HEADER.FIELDS (TO CC BCC)])'
+# Messages per COPY/STORE sequence-set, keeping command lines within the
+# 1000 message ceiling RFC 2683 recommends
+_MOVE_BATCH = 1000
+
+# Longest wait in seconds between reconnection attempts
+_MAX_BACKOFF = 60
+# Servers may drop an IDLE after 30 minutes (RFC 2177), so re-issue it sooner
+_IDLE_TIMEOUT = 29 * 60
+
+# One LIST response row: (flags) "delimiter" name
+_LIST_RE = re.compile(
+    rb'\((?P<flags>[^)]*)\) (?P<delimiter>"(?:[^"\\]|\\.)*"|NIL) (?P<name>.*)$')
+# Backslash escapes inside a quoted mailbox name
+_QUOTED_RE = re.compile(rb'\\(.)')
+
+
+def _folder_key(folder_name: str) -> str:
+    """
+    Normalise a folder name for cache lookups.
+
+    INBOX is case-insensitive, including as the root of a hierarchy, so
+    "Inbox.John" and "INBOX.John" refer to the same folder.
+
+    Args:
+        folder_name: Name of folder
+
+    Returns:
+        Folder name with any INBOX prefix upper-cased
+    """
+    if folder_name[:5].upper() == 'INBOX' and not folder_name[5:6].isalnum():
+        return 'INBOX' + folder_name[5:]
+    return folder_name
+
+
+def _scan_recipient_headers(raw: bytes) -> List[bytes]:
+    """
+    Collect the To, Cc and Bcc header values from raw message headers.
+
+    A plain scan of the header lines, avoiding the full email parser when
+    only three headers are needed. Folded values are unfolded.
+
+    Args:
+        raw: Raw message headers, as returned by a header FETCH
+
+    Returns:
+        Header values, all To values first, then Cc, then Bcc
+    """
+    # Lines of each header are joined once at the end, as repeated bytes
+    # concatenation is quadratic on headers folded over many lines
+    found: Dict[bytes, List[List[bytes]]] = {b'to': [], b'cc': [], b'bcc': []}
+    lines: Optional[List[bytes]] = None
+    for line in raw.splitlines():
+        if not line:
+            # Blank line ends the headers
+            break
+        if line[:1] in (b' ', b'\t'):
+            # Continuation of the previous header
+            if lines is not None:
+                lines.append(line)
+            continue
+        name, colon, value = line.partition(b':')
+        headers = found.get(name.rstrip().lower()) if colon else None
+        if headers is None:
+            lines = None
+        else:
+            lines = [value]
+            headers.append(lines)
+
+    return [b''.join(lines).strip()
+            for name in (b'to', b'cc', b'bcc') for lines in found[name]]
+
+
+def _recipient_addresses(values: List[str]) -> List[str]:
+    """
+    Extract email addresses from recipient header values.
+
+    getaddresses handles display names, quoted locals and group syntax in
+    a single pass.
+
+    Args:
+        values: To, Cc and Bcc header values
+
+    Returns:
+        List of recipient email addresses
+    """
+    return [addr for _, addr in getaddresses(values) if '@' in addr]
+
+
+def _simple_addresses(value: bytes) -> Optional[List[str]]:
+    """
+    Extract email addresses from a plain address list header value.
+
+    Values such as "a@example.com, Name <b@example.com>" are split with
+    bytes operations alone. Anything using quoting, comments or group
+    syntax is left to getaddresses.
+
+    Args:
+        value: Raw To, Cc or Bcc header value
+
+    Returns:
+        List of email addresses, or None if the value needs full parsing
+    """
+    if len(value.translate(None, _ADDRESS_SPECIALS)) != len(value):
+        return None
+
+    addresses = []
+    for token in value.split(b','):
+        if not token.strip():
+            continue
+        name, bracket, addr = token.rpartition(b'<')
+        if bracket:
+            addr, bracket, rest = addr.partition(b'>')
+            if not bracket or rest.strip() or b'>' in name or b'@' in name:
+                return None
+        addr = addr.strip()
+        # Anything but a single user@domain word needs the full parser
+        user, at, domain = addr.partition(b'@')
+        if (not user or not domain or b'@' in domain or b'>' in addr
+                or len(addr.split()) > 1):
+            return None
+        addresses.append(addr.decode('utf-8', 'replace'))
+    return addresses
+
+
+def _header_recipients(values: List[bytes]) -> List[str]:
+    """
+    Extract email addresses from raw recipient header values.
+
+    Args:
+        values: Raw To, Cc and Bcc header values
+
+    Returns:
+        List of recipient email addresses
+    """
+    recipients = []
+    for value in values:
+        addresses = _simple_addresses(value)
+        if addresses is None:
+            addresses = _recipient_addresses([value.decode('utf-8', 'replace')])
+        recipients.extend(addresses)
+    return recipients
+
+
+def _has_buffered_input(conn: IMAP4) -> bool:
+    """
+    Check for received data that select() on the socket would not report.
+
+    Args:
+        conn: IMAP connection
+
+    Returns:
+        True if a read from conn.file would not block
+    """
+    # Lines already read into conn.file's buffer, or decrypted by the SSL
+    # layer, are gone from the socket. peek() returns the buffer, or reads
+    # whatever the socket holds without blocking when it is empty
+    timeout = conn.sock.gettimeout()
+    conn.sock.settimeout(0.0)
+    try:
+        return bool(conn.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        conn.sock.settimeout(timeout)
+
+
+class PipelinedIMAP4_SSL(IMAP4_SSL):
+    """IMAP4_SSL client that can send several commands before reading replies."""
+
+    def pipeline(self, *commands: Tuple[str, ...]) -> List[Tuple[str, list]]:
+        """
+        Send commands back-to-back, then collect their results in order.
+
+        imaplib matches tagged replies to their commands as they arrive, so
+        waiting on each tag in turn is safe. Only pipeline commands whose
+        outcome does not depend on an earlier one in the same call.
+
+        Args:
+            commands: Commands with their arguments, e.g.
+                ('UID', 'COPY', '1:3', 'Inbox.John')
+
+        Returns:
+            (status, data) for each command; a BAD reply is returned rather
+            than raised so the remaining replies are still read
+        """
+        tags = [self._command(*command) for command in commands]
+        results = []
+        for command, tag in zip(commands, tags):
+            try:
+                results.append(self._command_complete(command[0], tag))
+            except self.abort:
+                raise
+            except self.error as e:
+                results.append(('BAD', [str(e).encode()]))
+        return results
 
 
 class MTFSSProcessor:
     """Main class for processing emails and organizing them into folders."""
 
-    def __init__(self, imap_server: str, username: str, password: str, primary_domain: str):
+    def __init__(self, imap_server: str, username: str, password: str, primary_domain: str,
+                 state_file: Optional[str] = None):
         """
         Initialize the MTFSS processor.
 
@@ -30,13 +254,23 @@ class MTFSSProcessor:
             username: IMAP username
             password: IMAP password
             primary_domain: Primary domain for user folder routing
+            state_file: File recording the last processed UID, so a restart
+                resumes where the previous run stopped (None to disable)
         """
         self.imap_server = imap_server
         self.username = username
         self.password = password
         self.primary_domain = primary_domain
-        self.connection: Optional[IMAP4_SSL] = None
+        self.state_file = state_file
+        self.connection: Optional[PipelinedIMAP4_SSL] = None
         self.first_pass = True
+        self._pending_moves: Dict[str, List[bytes]] = {}
+        self._caps: Set[bytes] = set()
+        self._folder_cache: Optional[Set[str]] = None
+        self._archive_folder = ARCHIVE_FOLDER
+        self._folder_decision: Dict[Tuple[str, str], str] = {}
+        # Lowest UID left in INBOX this session, per UIDVALIDITY
+        self._unhandled_uid: Dict[str, int] = {}
 
         # Setup logging
         logging.basicConfig(
@@ -44,22 +278,31 @@ class MTFSSProcessor:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
+        self._uid_state = self._load_state()
 
     def connect(self):
         """
         Establish connection to IMAP server.
         """
         try:
-            self.logger.info("Connecting to IMAP server: %s", self.imap_server)
-            self.logger.info("Using username: %s", self.username)
-            self.logger.info("Using password: %s", '*' * len(self.password))
-            self.logger.info("Using primary domain: %s", self.primary_domain)
-            self.connection = IMAP4_SSL(self.imap_server)
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Connecting to IMAP server: %s", self.imap_server)
+                self.logger.info("Using username: %s", self.username)
+                self.logger.info("Using password: %s", '*' * len(self.password))
+                self.logger.info("Using primary domain: %s", self.primary_domain)
+            self.connection = PipelinedIMAP4_SSL(self.imap_server)
             self.connection.login(self.username, self.password)
+
+            # Servers may advertise more capabilities once authenticated
+            status, data = self.connection.capability()
+            self._caps = set(data[0].upper().split()) \
+                if status == 'OK' and data and data[0] else set()
             self.logger.info("Connected to IMAP server: %s", self.imap_server)
             return True
         except IMAP4.error as e:
             self.logger.error("Failed to connect to IMAP server: %s", e)
+            # An unauthenticated connection can't be used; reconnect instead
+            self._drop_connection()
             return False
 
     def disconnect(self):
@@ -85,18 +328,16 @@ class MTFSSProcessor:
         Returns:
             List of recipient email addresses
         """
-        recipients = []
+        # Check To, CC, and BCC headers in one pass over the raw headers,
+        # skipping the policy's header parsing
+        found: Dict[str, List[bytes]] = {'to': [], 'cc': [], 'bcc': []}
+        for name, value in msg.raw_items():
+            values = found.get(name.lower())
+            if values is not None:
+                values.append(str(value).encode('utf-8', 'surrogateescape'))
 
-        # Check To, CC, and BCC headers
-        for header in ['To', 'Cc', 'Bcc']:
-            header_value = msg.get(header)
-            if header_value:
-                # Extract email addresses using regex
-                emails = re.findall(
-                    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', header_value)
-                recipients.extend(emails)
-
-        return recipients
+        # Same extraction as routing fetched headers in process_inbox
+        return _header_recipients(found['to'] + found['cc'] + found['bcc'])
 
     def parse_email_address(self, email_addr: str) -> Tuple[str, str]:
         """
@@ -108,9 +349,9 @@ class MTFSSProcessor:
         Returns:
             Tuple of (user, domain)
         """
-        match = re.match(r'^([^@]+)@(.+)$', email_addr.strip())
-        if match:
-            return match.group(1), match.group(2)
+        user, _, domain = email_addr.strip().rpartition('@')
+        if user and domain:
+            return user, domain
         return "", ""
 
     def determine_folder(self, user: str, domain: str) -> str:
@@ -127,19 +368,26 @@ class MTFSSProcessor:
         if not user or not domain:
             return "unmatched"
 
+        # Many messages in a pass share a recipient
+        folder = self._folder_decision.get((user, domain))
+        if folder is not None:
+            return folder
+
         user_folder = user.capitalize()
         domain_folder = domain.lower().replace('.', '_')
 
         # Check if this is an ignored user
-        ignore_folder = f"{ARCHIVE_FOLDER}.{user_folder}"
+        ignore_folder = f"{self._archive_folder}.{user_folder}"
         if self.folder_exists(ignore_folder):
-            return ignore_folder
-
+            folder = ignore_folder
         # Route based on domain
-        if domain == self.primary_domain:
-            return f"Inbox.{user_folder}"
+        elif domain == self.primary_domain:
+            folder = f"Inbox.{user_folder}"
+        else:
+            folder = f"Inbox.{user_folder}@{domain_folder}"
 
-        return f"Inbox.{user_folder}@{domain_folder}"
+        self._folder_decision[(user, domain)] = folder
+        return folder
 
     def folder_exists(self, folder_name: str) -> bool:
         """
@@ -152,18 +400,62 @@ class MTFSSProcessor:
             True if folder exists, False otherwise
         """
         try:
-            if not self.connection:
-                raise ValueError("No IMAP connection available")
-
-            # List folders matching the name
-            status, folders = self.connection.list('""', folder_name)
-            print(
-                f"DEBUG: folder_exists('{folder_name}') returned status={status}, folders={folders}")
-            return status == 'OK' and folders is not None and len(folders) > 0 and folders[0] is not None
+            if self._folder_cache is None:
+                self._refresh_folder_cache()
+            exists = _folder_key(folder_name) in self._folder_cache
+            self.logger.debug("folder_exists(%r) -> %s", folder_name, exists)
+            return exists
         except IMAP4.error as e:
             self.logger.error("Error checking folder existence: %s", e)
             raise
 
+    def _refresh_folder_cache(self):
+        """
+        Load the names of all folders on the server with a single LIST.
+
+        Also picks the archive folder: the existing ARCHIVE_FOLDER if there
+        is one, otherwise a folder the server marks as \\Archive (RFC 6154).
+        """
+        if not self.connection:
+            raise ValueError("No IMAP connection available")
+
+        if {b'LIST-EXTENDED', b'SPECIAL-USE'} <= self._caps:
+            # imaplib's list() cannot pass LIST return options
+            status, rows = self.connection._untagged_response(
+                *self.connection._simple_command(
+                    'LIST', '""', '*', 'RETURN', '(SPECIAL-USE)'),
+                'LIST')
+        else:
+            status, rows = self.connection.list('""', '*')
+
+        folders = set()
+        special_archive = None
+        if status == 'OK':
+            for row in rows or []:
+                if isinstance(row, tuple):
+                    # Name was sent as a literal following the row
+                    match = _LIST_RE.match(row[0])
+                    name = row[1]
+                else:
+                    match = _LIST_RE.match(row or b'')
+                    if not match:
+                        continue
+                    name = match.group('name')
+                    if name.startswith(b'"'):
+                        name = _QUOTED_RE.sub(rb'\1', name[1:-1])
+                folder_name = name.decode('utf-8', 'replace')
+                folders.add(_folder_key(folder_name))
+                if match and b'\\archive' in match.group('flags').lower().split():
+                    special_archive = folder_name
+
+        self.logger.debug("LIST returned status=%s, %d folders",
+                          status, len(folders))
+        self._folder_cache = folders
+        if ARCHIVE_FOLDER not in folders and special_archive:
+            self._archive_folder = special_archive
+        else:
+            self._archive_folder = ARCHIVE_FOLDER
+
     def create_folder(self, folder_name: str) -> bool:
         """
         Create a folder on the IMAP server.
@@ -181,6 +473,8 @@ class MTFSSProcessor:
             status, _ = self.connection.create(folder_name)
             if status == 'OK':
                 self.logger.info("Created folder: %s", folder_name)
+                if self._folder_cache is not None:
+                    self._folder_cache.add(_folder_key(folder_name))
                 return True
             else:
                 self.logger.error("Failed to create folder: %s", folder_name)
@@ -194,84 +488,362 @@ class MTFSSProcessor:
         Move an email to the target folder.
 
         Args:
-            msg_id: Message ID to move
+            msg_id: Message UID to move
             target_folder: Destination folder
 
         Returns:
             True if moved successfully, False otherwise
         """
+        return self._move_messages([(target_folder, [msg_id])])[0]
+
+    def _move_messages(
+            self, batches: Sequence[Tuple[str, Sequence[Union[bytes, str]]]]
+    ) -> List[bool]:
+        """
+        Move batches of emails with one COPY per batch and shared STOREs.
+
+        The COPY commands for all batches are pipelined, followed by
+        pipelined STOREs merging the batches copied successfully into
+        sequence-sets of up to _MOVE_BATCH messages, so any number of
+        batches costs two round-trips.
+
+        Args:
+            batches: Pairs of destination folder and message UIDs to move
+
+        Returns:
+            Whether each batch was moved successfully
+        """
+        seqsets = [(target_folder,
+                    ','.join(msg_id.decode() if isinstance(msg_id, bytes) else msg_id
+                             for msg_id in msg_ids))
+                   for target_folder, msg_ids in batches]
         try:
             if not self.connection:
                 raise ValueError("No IMAP connection available")
 
-            # Ensure target folder exists
-            if not self.folder_exists(target_folder):
-                self.create_folder(target_folder)
-
-            # Move the message
-            status, _ = self.connection.copy(msg_id, target_folder)
-            if status == 'OK':
-                self.logger.info("Moved message %s to %s",
-                                 msg_id, target_folder)
-                # Mark original message for deletion
-                self.connection.store(msg_id, '+FLAGS', '\\Deleted')
-                return True
-            else:
-                self.logger.error(
-                    "Failed to move message %s to %s", msg_id, target_folder)
-                return False
+            # Ensure target folders exist
+            for target_folder in dict.fromkeys(folder for folder, _ in seqsets):
+                if not self.folder_exists(target_folder):
+                    self.create_folder(target_folder)
+
+            # Move the messages, in one step when the server supports
+            # RFC 6851 MOVE
+            command = 'MOVE' if b'MOVE' in self._caps else 'COPY'
+            results = self.connection.pipeline(
+                *[('UID', command, seqset, target_folder)
+                  for target_folder, seqset in seqsets])
+
+            moved = []
+            for (target_folder, seqset), (status, _) in zip(seqsets, results):
+                moved.append(status == 'OK')
+                if status == 'OK':
+                    self.logger.info("Moved message %s to %s",
+                                     seqset, target_folder)
+                else:
+                    self.logger.error(
+                        "Failed to move message %s to %s", seqset, target_folder)
+
+            if command == 'COPY':
+                # Mark original messages for deletion once safely copied,
+                # merging all folders' sequence-sets into as few STOREs as
+                # the _MOVE_BATCH limit allows
+                stores: List[List[str]] = []
+                size = _MOVE_BATCH
+                for (_, msg_ids), (_, seqset), ok in zip(batches, seqsets, moved):
+                    if not ok:
+                        continue
+                    if size + len(msg_ids) > _MOVE_BATCH:
+                        stores.append([])
+                        size = 0
+                    stores[-1].append(seqset)
+                    size += len(msg_ids)
+                self.connection.pipeline(
+                    *[('UID', 'STORE', ','.join(seqset), '+FLAGS', '(\\Deleted)')
+                      for seqset in stores])
+            return moved
         except IMAP4.error as e:
-            self.logger.error("Error moving message %s: %s", msg_id, e)
+            self.logger.error("Error moving messages: %s", e)
             raise
 
+    def _plan_move(self, msg_id: bytes, target_folder: str):
+        """
+        Queue an email to be moved by the next call to _flush_moves.
+
+        Args:
+            msg_id: Message UID to move
+            target_folder: Destination folder
+        """
+        self._pending_moves.setdefault(target_folder, []).append(msg_id)
+
+    def _flush_moves(self) -> Set[bytes]:
+        """
+        Move all queued emails, with one COPY or MOVE per target folder.
+
+        Without MOVE, the copied messages of every folder are flagged for
+        deletion together, in one STORE per _MOVE_BATCH messages.
+
+        Returns:
+            UIDs of the messages moved
+        """
+        pending, self._pending_moves = self._pending_moves, {}
+        batches = [(target_folder, msg_ids[start:start + _MOVE_BATCH])
+                   for target_folder, msg_ids in pending.items()
+                   for start in range(0, len(msg_ids), _MOVE_BATCH)]
+        if not batches:
+            return set()
+
+        try:
+            moved = self._move_messages(batches)
+        except IMAP4.abort:
+            raise
+        except IMAP4.error:
+            return set()
+        return {msg_id
+                for (_, msg_ids), ok in zip(batches, moved) if ok
+                for msg_id in msg_ids}
+
+    def _state_key(self) -> str:
+        """Identify this account's inbox within a shared state file."""
+        return f"{self.imap_server}/{self.username}/INBOX"
+
+    def _read_state_file(self) -> dict:
+        """
+        Read the whole state file.
+
+        Returns:
+            Mapping of account inbox to its {UIDVALIDITY: last UID} state
+        """
+        try:
+            with open(self.state_file, encoding='utf-8') as state:
+                data = json.load(state)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+            return data
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning("Ignoring unreadable state file %s: %s",
+                                self.state_file, e)
+            return {}
+
+    def _load_state(self) -> Dict[str, int]:
+        """
+        Load the last processed UID for each inbox UIDVALIDITY.
+
+        Returns:
+            Mapping of UIDVALIDITY to last processed UID
+        """
+        if not self.state_file:
+            return {}
+        try:
+            entry = self._read_state_file().get(self._state_key(), {})
+            return {str(k): int(v) for k, v in entry.items()}
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.warning("Ignoring unreadable state for %s: %s",
+                                self._state_key(), e)
+            return {}
+
+    def _save_state(self):
+        """
+        Persist the last processed UID, replacing the file atomically.
+
+        The file is re-read first so that entries written by other
+        instances sharing it are kept.
+        """
+        if not self.state_file:
+            return
+        try:
+            data = self._read_state_file()
+            data[self._state_key()] = self._uid_state
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as state:
+                json.dump(data, state)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            self.logger.warning("Failed to save state file %s: %s",
+                                self.state_file, e)
+
     def process_inbox(self):
         """Process all emails in the inbox and sort them into folders."""
         if not self.connection:
             self.logger.error("No IMAP connection available")
             return
 
-        # Select inbox
+        # Select inbox; UIDs are only comparable across sessions while its
+        # UIDVALIDITY stays the same
         self.connection.select('INBOX')
-
-        if not self.folder_exists(ARCHIVE_FOLDER):
-            self.create_folder(ARCHIVE_FOLDER)
-
-        # Search for all unread emails
-        search_type = 'UNSEEN' if not self.first_pass else 'ALL'
-        status, messages = self.connection.search(None, search_type)
+        _, data = self.connection.response('UIDVALIDITY')
+        # SELECT reports the mailbox size as EXISTS; drop it so that
+        # wait_for_mail only sees mail announced after this search
+        self.connection.response('EXISTS')
+        uid_validity = data[0].decode() if data and data[0] else None
+        self._refresh_folder_cache()
+        self._folder_decision = {}
+
+        if not self.folder_exists(self._archive_folder):
+            self.create_folder(self._archive_folder)
+
+        # Search for all unread emails, or on the first pass everything since
+        # the last run
+        last_uid = self._uid_state.get(uid_validity, 0) if uid_validity else 0
+        if not self.first_pass:
+            search_type = 'UNSEEN'
+        elif last_uid:
+            search_type = f'UID {last_uid + 1}:*'
+        else:
+            search_type = 'ALL'
+        status, messages = self.connection.uid('SEARCH', search_type)
         self.first_pass = False
         if status != 'OK':
             self.logger.error("Failed to search for messages")
             return
 
-        message_ids = messages[0].split()
-        self.logger.info("Processing %s new messages", len(message_ids))
+        # Left as the space-separated SEARCH result, which the fetch thread
+        # slices into batches
+        message_ids = messages[0].strip()
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Processing %s new messages",
+                             message_ids.count(b' ') + 1 if message_ids else 0)
+
+        # Fetch on a separate thread so network round-trips overlap with
+        # parsing and routing here; the fetch thread is the only user of
+        # the connection until it finishes, as imaplib is not thread-safe
+        fetched: queue.Queue = queue.Queue(maxsize=_FETCH_QUEUE_SIZE)
+        stop = threading.Event()
+        fetcher = threading.Thread(target=self._fetch_messages,
+                                   args=(message_ids, fetched, stop),
+                                   daemon=True)
+        fetcher.start()
+
+        item = None
+        try:
+            while (item := fetched.get()) is not _END_OF_FETCH:
+                if isinstance(item, Exception):
+                    raise item
+                self._route_messages(item)
+        finally:
+            # Wait for the fetch thread to let go of the connection
+            stop.set()
+            while item is not _END_OF_FETCH:
+                item = fetched.get()
+            fetcher.join()
+
+        moved = self._flush_moves()
+        if uid_validity:
+            self._advance_uid_state(uid_validity, message_ids, moved)
+
+        # Expunge deleted messages; MOVE leaves none behind
+        if b'MOVE' not in self._caps:
+            self.connection.expunge()
+
+    def _advance_uid_state(self, uid_validity: str, message_ids: bytes,
+                           moved: Set[bytes]):
+        """
+        Save the last UID a restart can resume after.
+
+        A restart only searches above the saved UID, so it never passes a
+        message left in INBOX by a failed FETCH, COPY or unparsable reply.
 
-        for msg_id in message_ids:
-            try:
-                # Fetch the email
-                status, msg_data = self.connection.fetch(
-                    msg_id, '(RFC822)')
-                if status != 'OK':
-                    self.logger.error("Failed to fetch message %s", msg_id)
+        Args:
+            uid_validity: UIDVALIDITY of the selected inbox
+            message_ids: Space-separated UIDs found by this pass's SEARCH
+            moved: UIDs moved by this pass
+        """
+        limit = self._unhandled_uid.get(uid_validity)
+        if len(moved) < (message_ids.count(b' ') + 1 if message_ids else 0):
+            lowest = min(int(msg_id) for msg_id in message_ids.split()
+                         if msg_id not in moved)
+            limit = lowest if limit is None else min(limit, lowest)
+            self._unhandled_uid = {uid_validity: limit}
+
+        resume_uid = max((int(msg_id) for msg_id in moved
+                          if limit is None or int(msg_id) < limit), default=0)
+        if resume_uid > self._uid_state.get(uid_validity, 0):
+            self._uid_state = {uid_validity: resume_uid}
+            self._save_state()
+
+    def _fetch_messages(self, message_ids: bytes, fetched: queue.Queue,
+                        stop: threading.Event):
+        """
+        Fetch recipient headers in batches, queueing each batch's response.
+
+        Runs on the fetch thread started by process_inbox. Always finishes
+        by queueing _END_OF_FETCH, preceded by any unexpected exception.
+
+        Args:
+            message_ids: Space-separated message UIDs to fetch
+            fetched: Queue receiving FETCH response data
+            stop: Set when no further batches should be fetched
+        """
+        try:
+            start = 0
+            while start < len(message_ids) and not stop.is_set():
+                # Find the end of the next _FETCH_BATCH UIDs
+                end = start
+                for _ in range(_FETCH_BATCH):
+                    end = message_ids.find(b' ', end + 1)
+                    if end < 0:
+                        end = len(message_ids)
+                        break
+                batch = message_ids[start:end].replace(b' ', b',')
+                start = end + 1
+                try:
+                    # Fetch a batch of emails in a single round-trip
+                    status, msg_data = self.connection.uid(
+                        'FETCH', batch, _FETCH_ITEMS)
+                    if status != 'OK':
+                        self.logger.error("Failed to fetch messages %s", batch)
+                        continue
+                except IMAP4.abort:
+                    # The connection is gone; let run_continuous reconnect
+                    raise
+                except IMAP4.error as e:
+                    self.logger.error(
+                        "Error fetching messages %s: %s", batch, e)
                     continue
+                fetched.put(msg_data)
+        except Exception as e:
+            fetched.put(e)
+        finally:
+            fetched.put(_END_OF_FETCH)
 
-                # Parse email
-                # pyright: ignore[reportOptionalSubscript]
-                raw_email = msg_data[0][1]
-                if not isinstance(raw_email, bytes):
+    def _route_messages(self, msg_data: list):
+        """
+        Queue moves for each email in a FETCH response.
+
+        Args:
+            msg_data: Response data from a FETCH of recipient headers
+        """
+        for i, part in enumerate(msg_data):
+            # Each message arrives as an (envelope, body) tuple followed by
+            # the rest of the response, usually just a closing b')'
+            if not isinstance(part, tuple):
+                continue
+
+            # Servers may return the UID before or after the header literal
+            match = _UID_RE.search(part[0])
+            if (not match and i + 1 < len(msg_data)
+                    and isinstance(msg_data[i + 1], bytes)):
+                match = _UID_RE.search(msg_data[i + 1])
+            if not match:
+                self.logger.error("No UID in fetch response %s", part[0])
+                continue
+            msg_id = match.group(1)
+            try:
+                raw_headers = part[1]
+                if not isinstance(raw_headers, bytes):
                     self.logger.error(
                         "Invalid email data format for message %s", msg_id)
                     continue
-                msg = email.message_from_bytes(raw_email)
 
                 # Extract recipients
-                recipients = self.extract_recipients(msg)
+                recipients = _header_recipients(
+                    _scan_recipient_headers(raw_headers))
 
                 if not recipients:
                     self.logger.warning(
                         "No recipients found for message %s", msg_id)
-                    self.move_email(msg_id, "unmatched")
+                    self._plan_move(msg_id, "unmatched")
                     continue
 
                 # Process first recipient (primary routing)
@@ -279,20 +851,86 @@ class MTFSSProcessor:
                 user, domain = self.parse_email_address(recipient)
                 target_folder = self.determine_folder(user, domain)
 
-                # Move email to target folder
-                self.move_email(msg_id, target_folder)
+                # Queue email for moving to target folder
+                self._plan_move(msg_id, target_folder)
 
             except IMAP4.error as e:
-                self.logger.error("Error processing message %s: %s", msg_id, e)
+                self.logger.error(
+                    "Error processing message %s: %s", msg_id, e)
                 continue
 
-        # Expunge deleted messages
-        self.connection.expunge()
+    def wait_for_mail(self, timeout: float) -> bool:
+        """
+        Wait in IMAP IDLE until the server announces new mail.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if new mail was announced, False if the wait timed out
+        """
+        if not self.connection:
+            raise ValueError("No IMAP connection available")
+
+        # New mail announced in reply to an earlier command needs no wait
+        conn = self.connection
+        if conn.untagged_responses.pop('EXISTS', None):
+            return True
+
+        # imaplib has no IDLE support, so drive the exchange by hand
+        tag = conn._new_tag()
+        conn.send(tag + b' IDLE\r\n')
+        new_mail = False
+        while True:
+            line = conn.readline()
+            if not line:
+                raise IMAP4.abort("Connection closed during IDLE")
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                del conn.tagged_commands[tag]
+                raise IMAP4.error(f"IDLE rejected: {line.decode(errors='replace')}")
+            # Mail may be announced before the server starts idling
+            new_mail = new_mail or (line.startswith(b'* ') and
+                                    line.rstrip().endswith(b' EXISTS'))
+
+        deadline = time.monotonic() + timeout
+        while not new_mail:
+            remaining = deadline - time.monotonic()
+            # The server may send EXISTS in the same packet as the
+            # continuation, leaving it buffered where select() can't see it
+            if remaining <= 0 or not (
+                    _has_buffered_input(conn) or
+                    select.select([conn.sock], [], [], remaining)[0]):
+                break
+            line = conn.readline()
+            if not line:
+                raise IMAP4.abort("Connection closed during IDLE")
+            if line.startswith(b'* BYE'):
+                raise IMAP4.abort(line.decode(errors='replace'))
+            new_mail = line.startswith(b'* ') and line.rstrip().endswith(b' EXISTS')
+
+        # End the IDLE and skip any remaining untagged updates
+        conn.send(b'DONE\r\n')
+        while True:
+            line = conn.readline()
+            if not line:
+                raise IMAP4.abort("Connection closed during IDLE")
+            if line.startswith(tag + b' '):
+                break
+        del conn.tagged_commands[tag]
+        if not line.startswith(tag + b' OK'):
+            self.logger.warning("IDLE ended with: %s",
+                                line.decode(errors='replace').strip())
+        return new_mail
 
     def run_continuous(self, check_interval: int = 30):
         """
         Run continuously, checking for new emails at regular intervals.
 
+        When the server supports IDLE, new mail is processed as soon as the
+        server announces it and check_interval only bounds how long to wait.
+
         Args:
             check_interval: Seconds between checks
         """
@@ -302,20 +940,45 @@ class MTFSSProcessor:
         def try_connect():
             if not self.connection:
                 if not self.connect():
-                    self.logger.error("Failed to connect, waiting...")
+                    self.logger.error("Failed to connect, retrying...")
                     return False
             return True
 
-        while True:
+        # Seconds to wait before retrying after a failure, doubling up to
+        # _MAX_BACKOFF while the server stays unreachable
+        backoff = 1.0
+        try:
+            while True:
+                try:
+                    if try_connect():
+                        self.process_inbox()
+                        backoff = 1.0
+                        if self.connection and b'IDLE' in self._caps:
+                            # Inbox is still selected; processing runs again
+                            # on new mail or after the interval regardless
+                            self.wait_for_mail(
+                                min(check_interval, _IDLE_TIMEOUT))
+                        else:
+                            time.sleep(check_interval)
+                        continue
+                except (IMAP4.abort, OSError) as e:
+                    self.logger.error("Lost connection to IMAP server: %s", e)
+                    self._drop_connection()
+
+                time.sleep(backoff)
+                backoff = min(backoff * 2, _MAX_BACKOFF)
+
+        except KeyboardInterrupt:
+            self.logger.info("Received interrupt signal, shutting down...")
+
+    def _drop_connection(self):
+        """Discard a broken IMAP connection so the next check reconnects."""
+        if self.connection:
             try:
-                if try_connect():
-                    self.process_inbox()
-
-            except KeyboardInterrupt:
-                self.logger.info("Received interrupt signal, shutting down...")
-                break
-
-            time.sleep(check_interval)
+                self.connection.shutdown()
+            except OSError:
+                pass
+            self.connection = None
 
 
 def main():
@@ -332,6 +995,10 @@ def main():
                         help='Check interval in seconds (default: 300)')
     parser.add_argument('-o', '--once', action='store_true',
                         help='Process once and exit (don\'t run continuously)')
+    parser.add_argument('--state-file',
+                        help='File recording the last processed message '
+                             '(or set MTFSS_STATE_FILE env var, default: '
+                             '~/.mtfss-state.json)')
 
     args = parser.parse_args()
 
@@ -351,9 +1018,10 @@ def main():
     password = process_arg(args.password, 'IMAP_PASSWORD', 'password')
     domain = process_arg(args.domain, 'PRIMARY_DOMAIN', 'domain')
     server = process_arg(args.server, 'IMAP_SERVER', 'server')
+    state_file = args.state_file or os.getenv('MTFSS_STATE_FILE') or STATE_FILE
 
     # Create processor
-    processor = MTFSSProcessor(server, username, password, domain)
+    processor = MTFSSProcessor(server, username, password, domain, state_file)
     # Connect to server
     if not processor.connect():
         sys.exit(1)
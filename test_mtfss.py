@@ -5,12 +5,31 @@ Test suite for MTFSS - Multi-Tenant Folder Sorting Sieve
 
 import email
 import email.message
+import io
+import json
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock, Mock, patch
+from imaplib import IMAP4
+from unittest.mock import MagicMock, Mock, call, patch
 
 import pytest
 
-from mtfss import MTFSSProcessor
+from mtfss import (MTFSSProcessor, PipelinedIMAP4_SSL, _header_recipients,
+                   _recipient_addresses, _scan_recipient_headers,
+                   _simple_addresses)
+
+
+def mock_imap_commands(connection):
+    """Route uid() and pipelined commands to the mock's command methods."""
+    def command(name, *args):
+        if name == 'UID':
+            name, *args = args
+        return getattr(connection, name.lower())(*args)
+
+    connection.uid.side_effect = lambda *args: command('UID', *args)
+    connection.pipeline.side_effect = lambda *commands: [
+        command(*args) for args in commands]
 
 
 class TestMTFSSProcessor(unittest.TestCase):
@@ -28,6 +47,8 @@ class TestMTFSSProcessor(unittest.TestCase):
         # Mock the IMAP connection
         self.mock_connection = MagicMock()
         self.mock_connection.list.return_value = ('OK', [])
+        self.mock_connection.response.return_value = ('UIDVALIDITY', [b'7'])
+        mock_imap_commands(self.mock_connection)
         self.processor.connection = self.mock_connection
 
     def test_parse_email_address_valid(self):
@@ -84,6 +105,29 @@ class TestMTFSSProcessor(unittest.TestCase):
         expected = ['john@example.com', 'jane@test.org', 'support@company.com']
         self.assertEqual(sorted(recipients), sorted(expected))
 
+    def test_extract_recipients_quoted_and_groups(self):
+        """Test extracting recipients from quoted locals and group syntax."""
+        msg = email.message.Message()
+        msg['To'] = '"john smith"@example.com, undisclosed-recipients:;'
+        msg['Cc'] = 'Team: alice@example.com, bob@test.org;'
+
+        recipients = self.processor.extract_recipients(msg)
+
+        expected = ['"john smith"@example.com',
+                    'alice@example.com', 'bob@test.org']
+        self.assertEqual(sorted(recipients), sorted(expected))
+
+    def test_extract_recipients_header_priority(self):
+        """Test To recipients come first regardless of header order."""
+        msg = email.message_from_bytes(
+            b'Cc: cc@example.com\r\n'
+            b'to: Folded Name\r\n <to@example.com>\r\n'
+            b'Subject: test\r\n\r\n')
+
+        recipients = self.processor.extract_recipients(msg)
+
+        self.assertEqual(recipients, ['to@example.com', 'cc@example.com'])
+
     def test_extract_recipients_no_recipients(self):
         """Test extracting recipients when none are present."""
         msg = email.message.EmailMessage()
@@ -123,6 +167,16 @@ class TestMTFSSProcessor(unittest.TestCase):
             # Verify folder_exists was called
             mock_exists.assert_called_with("archived.John")
 
+    def test_determine_folder_memoized(self):
+        """Test repeated recipients reuse the earlier routing decision."""
+        with patch.object(self.processor, 'folder_exists',
+                          return_value=False) as mock_exists:
+            for _ in range(3):
+                folder = self.processor.determine_folder("john", "example.com")
+                self.assertEqual(folder, "Inbox.John")
+
+            mock_exists.assert_called_once_with("archived.John")
+
     def test_folder_exists_true(self):
         """Test folder existence check when folder exists."""
         self.mock_connection.list.return_value = (
@@ -131,7 +185,70 @@ class TestMTFSSProcessor(unittest.TestCase):
         result = self.processor.folder_exists("test_folder")
         self.assertTrue(result)
 
-        self.mock_connection.list.assert_called_with('""', "test_folder")
+        self.mock_connection.list.assert_called_with('""', '*')
+
+    def test_folder_exists_cached(self):
+        """Test folder existence checks share a single LIST of all folders."""
+        self.mock_connection.list.return_value = ('OK', [
+            b'(\\HasNoChildren) "." "INBOX.John"',
+            b'(\\HasChildren) "." archived',
+            (b'(\\HasNoChildren) "." {10}', b'Odd "name"'),
+        ])
+
+        self.assertTrue(self.processor.folder_exists("Inbox.John"))
+        self.assertTrue(self.processor.folder_exists("archived"))
+        self.assertTrue(self.processor.folder_exists('Odd "name"'))
+        self.assertFalse(self.processor.folder_exists("Inbox.Jane"))
+
+        self.mock_connection.list.assert_called_once_with('""', '*')
+
+    def test_folder_exists_logs_at_debug(self):
+        """Test folder checks are only reported through debug logging."""
+        with patch('builtins.print') as mock_print, \
+                self.assertLogs('mtfss', level='DEBUG') as logs:
+            self.processor.folder_exists("missing")
+
+        mock_print.assert_not_called()
+        self.assertIn("DEBUG:mtfss:folder_exists('missing') -> False",
+                      logs.output)
+
+    def test_folder_cache_special_use_archive(self):
+        """Test a server-flagged \\Archive folder is used for archiving."""
+        self.processor._caps = {b'LIST-EXTENDED', b'SPECIAL-USE'}
+        rows = [b'(\\HasNoChildren) "." INBOX',
+                b'(\\HasChildren \\Archive) "." "Archive"',
+                b'(\\HasNoChildren) "." "Archive.John"']
+        self.mock_connection._simple_command.return_value = ('OK', [None])
+        self.mock_connection._untagged_response.return_value = ('OK', rows)
+
+        self.processor._refresh_folder_cache()
+
+        self.mock_connection._simple_command.assert_called_once_with(
+            'LIST', '""', '*', 'RETURN', '(SPECIAL-USE)')
+        self.mock_connection.list.assert_not_called()
+        self.assertEqual(
+            self.processor.determine_folder("john", "example.com"),
+            "Archive.John")
+
+    def test_folder_cache_prefers_existing_archive(self):
+        """Test an existing archived folder wins over a \\Archive folder."""
+        self.mock_connection.list.return_value = ('OK', [
+            b'(\\Archive) "." "Archive"',
+            b'(\\HasChildren) "." "archived"',
+        ])
+
+        self.processor._refresh_folder_cache()
+
+        self.assertEqual(self.processor._archive_folder, "archived")
+
+    def test_create_folder_updates_cache(self):
+        """Test created folders are added to the folder cache."""
+        self.mock_connection.create.return_value = ('OK', [])
+
+        self.assertFalse(self.processor.folder_exists("new_folder"))
+        self.processor.create_folder("new_folder")
+        self.assertTrue(self.processor.folder_exists("new_folder"))
+        self.mock_connection.list.assert_called_once()
 
     def test_folder_exists_false(self):
         """Test folder existence check when folder doesn't exist."""
@@ -200,6 +317,70 @@ class TestMTFSSProcessor(unittest.TestCase):
             result = self.processor.move_email("123", "target_folder")
             self.assertFalse(result)
 
+    def test_flush_moves_groups_by_folder(self):
+        """Test queued moves are issued once per target folder."""
+        self.mock_connection.copy.return_value = ('OK', [])
+        self.mock_connection.store.return_value = ('OK', [])
+
+        with patch.object(self.processor, 'folder_exists', return_value=True):
+            self.processor._plan_move(b'1', 'Inbox.John')
+            self.processor._plan_move(b'2', 'unmatched')
+            self.processor._plan_move(b'3', 'Inbox.John')
+            self.processor._flush_moves()
+
+        self.assertEqual(self.mock_connection.copy.call_count, 2)
+        self.mock_connection.copy.assert_any_call('1,3', 'Inbox.John')
+        self.mock_connection.copy.assert_any_call('2', 'unmatched')
+        self.assertEqual(self.processor._pending_moves, {})
+
+    def test_flush_moves_with_move_capability(self):
+        """Test MOVE is used instead of COPY and STORE."""
+        self.processor._caps = {b'MOVE'}
+        self.mock_connection.move.return_value = ('OK', [])
+
+        with patch.object(self.processor, 'folder_exists', return_value=True):
+            self.processor._plan_move(b'2', 'Inbox.John')
+            self.processor._plan_move(b'5', 'Inbox.John')
+            self.processor._plan_move(b'3', 'unmatched')
+            self.processor._plan_move(b'7', 'unmatched')
+            self.processor._flush_moves()
+
+        self.mock_connection.pipeline.assert_called_once_with(
+            ('UID', 'MOVE', '2,5', 'Inbox.John'),
+            ('UID', 'MOVE', '3,7', 'unmatched'))
+        self.mock_connection.copy.assert_not_called()
+        self.mock_connection.store.assert_not_called()
+
+    def test_flush_moves_pipelined(self):
+        """Test all COPYs are sent before any STORE, skipping failed copies."""
+        self.mock_connection.copy.side_effect = [('OK', []), ('NO', [])]
+        self.mock_connection.store.return_value = ('OK', [])
+
+        with patch.object(self.processor, 'folder_exists', return_value=True):
+            self.processor._plan_move(b'1', 'Inbox.John')
+            self.processor._plan_move(b'2', 'unmatched')
+            self.assertEqual(self.processor._flush_moves(), {b'1'})
+
+        self.assertEqual(self.mock_connection.pipeline.call_args_list, [
+            call(('UID', 'COPY', '1', 'Inbox.John'),
+                 ('UID', 'COPY', '2', 'unmatched')),
+            call(('UID', 'STORE', '1', '+FLAGS', '(\\Deleted)')),
+        ])
+
+    def test_flush_moves_single_store(self):
+        """Test one STORE flags the messages copied to every folder."""
+        self.mock_connection.copy.return_value = ('OK', [])
+        self.mock_connection.store.return_value = ('OK', [])
+
+        with patch.object(self.processor, 'folder_exists', return_value=True):
+            self.processor._plan_move(b'1', 'Inbox.John')
+            self.processor._plan_move(b'2', 'unmatched')
+            self.processor._plan_move(b'3', 'Inbox.John')
+            self.processor._flush_moves()
+
+        self.mock_connection.store.assert_called_once_with(
+            '1,3,2', '+FLAGS', '(\\Deleted)')
+
     def test_move_email_no_connection(self):
         """Test email move without connection."""
         self.processor.connection = None
@@ -207,21 +388,23 @@ class TestMTFSSProcessor(unittest.TestCase):
         with pytest.raises(Exception):
             self.processor.move_email("123", "target_folder")
 
-    @patch('mtfss.IMAP4_SSL')
+    @patch('mtfss.PipelinedIMAP4_SSL')
     def test_connect_success(self, mock_imap):
         """Test successful IMAP connection."""
         mock_conn = Mock()
         mock_imap.return_value = mock_conn
         mock_conn.login.return_value = ('OK', [])
+        mock_conn.capability.return_value = ('OK', [b'IMAP4rev1 Move IDLE'])
 
         processor = MTFSSProcessor("imap.test.com", "user", "pass", "test.com")
         processor.connect()
 
         self.assertEqual(processor.connection, mock_conn)
+        self.assertEqual(processor._caps, {b'IMAP4REV1', b'MOVE', b'IDLE'})
         mock_imap.assert_called_with("imap.test.com")
         mock_conn.login.assert_called_with("user", "pass")
 
-    @patch('mtfss.IMAP4_SSL')
+    @patch('mtfss.PipelinedIMAP4_SSL')
     def test_connect_failure(self, mock_imap):
         """Test failed IMAP connection."""
         mock_imap.side_effect = Exception("Connection failed")
@@ -261,7 +444,7 @@ class TestMTFSSProcessor(unittest.TestCase):
         """Test processing inbox with messages."""
         # Mock IMAP responses
         self.mock_connection.select.return_value = ('OK', [])
-        self.mock_connection.search.return_value = ('OK', [b'1 2 3'])
+        self.mock_connection.search.return_value = ('OK', [b'11 12 13'])
         self.mock_connection.store.return_value = ('OK', [])
         self.mock_connection.copy.return_value = ('OK', [])
         self.mock_connection.list.return_value = ('OK', [])
@@ -274,18 +457,181 @@ class TestMTFSSProcessor(unittest.TestCase):
         test_email['Subject'] = 'Test Email'
 
         email_bytes = test_email.as_bytes()
-        self.mock_connection.fetch.return_value = ('OK', [(None, email_bytes)])
+        fetch_data = []
+        for seq, uid in ((b'1', b'11'), (b'2', b'12'), (b'3', b'13')):
+            fetch_data.append((seq + b' (UID ' + uid +
+                               b' BODY[HEADER.FIELDS (TO CC BCC)] '
+                               b'{%d}' % len(email_bytes),
+                               email_bytes))
+            fetch_data.append(b')')
+        self.mock_connection.fetch.return_value = ('OK', fetch_data)
 
-        # Mock move_email method
-        with patch.object(self.processor, 'move_email', return_value=True) as mock_move:
-            self.processor.process_inbox()
+        self.processor.process_inbox()
+
+        # Should fetch all messages in a single batch
+        self.mock_connection.fetch.assert_called_once_with(
+            b'11,12,13', '(BODY.PEEK[HEADER.FIELDS (TO CC BCC)])')
 
-            # Should call move_email for each message
-            self.assertEqual(mock_move.call_count, 3)
+        # Should move all messages for one folder with a single COPY/STORE
+        self.mock_connection.copy.assert_called_once_with(
+            '11,12,13', 'Inbox.User')
+        self.mock_connection.store.assert_called_once_with(
+            '11,12,13', '+FLAGS', '(\\Deleted)')
 
         # Should call expunge
         self.mock_connection.expunge.assert_called_once()
 
+    def test_route_messages_uid_after_literal(self):
+        """Test a UID returned after the header literal is still used."""
+        headers = b'To: user@example.com\r\n\r\n'
+        msg_data = [
+            (b'1 (BODY[HEADER.FIELDS (TO CC BCC)] {%d}' % len(headers),
+             headers),
+            b' UID 7)',
+            (b'2 (UID 8 BODY[HEADER.FIELDS (TO CC BCC)] {%d}' % len(headers),
+             headers),
+            b')']
+
+        with patch.object(self.processor, 'folder_exists', return_value=True):
+            self.processor._route_messages(msg_data)
+
+        self.assertEqual(list(self.processor._pending_moves.values()),
+                         [[b'7', b'8']])
+
+    def test_process_inbox_resumes_from_state(self):
+        """Test the last processed UID is saved and used after a restart."""
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'state.json')
+            self.processor.state_file = state_file
+            self.mock_connection.search.return_value = ('OK', [b'41 42'])
+            self.mock_connection.create.return_value = ('OK', [])
+            self.mock_connection.copy.return_value = ('OK', [])
+            self.mock_connection.fetch.return_value = ('OK', [
+                (b'1 (UID 41 BODY[HEADER.FIELDS (TO CC BCC)] {2}', b'\r\n'),
+                b')',
+                (b'2 (UID 42 BODY[HEADER.FIELDS (TO CC BCC)] {2}', b'\r\n'),
+                b')'])
+
+            self.processor.process_inbox()
+
+            with open(state_file, encoding='utf-8') as state:
+                self.assertEqual(json.load(state), {
+                    'imap.example.com/test@example.com/INBOX': {'7': 42}})
+
+            processor = MTFSSProcessor("imap.example.com", "test@example.com",
+                                       "password", "example.com", state_file)
+            processor.connection = self.mock_connection
+            self.mock_connection.search.reset_mock()
+            self.mock_connection.search.return_value = ('OK', [b''])
+
+            processor.process_inbox()
+
+            self.mock_connection.search.assert_called_once_with('UID 43:*')
+
+    def test_process_inbox_failed_fetch_not_skipped_on_resume(self):
+        """Test messages left by a failed FETCH are searched after restart."""
+        headers = b'To: user@example.com\r\n\r\n'
+
+        def fetch_response(uids):
+            data = []
+            for uid in uids:
+                data.append((b'%d (UID %d BODY[HEADER.FIELDS (TO CC BCC)] '
+                             b'{%d}' % (uid, uid, len(headers)), headers))
+                data.append(b')')
+            return ('OK', data)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'state.json')
+            self.processor.state_file = state_file
+            self.mock_connection.search.return_value = (
+                'OK', [b' '.join(b'%d' % i for i in range(1, 151))])
+            self.mock_connection.create.return_value = ('OK', [])
+            self.mock_connection.copy.return_value = ('OK', [])
+            self.mock_connection.fetch.side_effect = [
+                ('NO', [b'Try again']), fetch_response(range(101, 151))]
+
+            self.processor.process_inbox()
+
+            self.mock_connection.copy.assert_called_once()
+            self.assertFalse(os.path.exists(state_file))
+
+            # Later passes must not move the resume point past UID 1 either
+            self.mock_connection.search.return_value = ('OK', [b'151'])
+            self.mock_connection.fetch.side_effect = [fetch_response([151])]
+
+            self.processor.process_inbox()
+
+            self.assertFalse(os.path.exists(state_file))
+
+    def test_state_file_shared_between_accounts(self):
+        """Test accounts sharing a state file keep separate entries."""
+        with tempfile.TemporaryDirectory() as tmp:
+            state_file = os.path.join(tmp, 'state.json')
+            first = MTFSSProcessor("imap.one.com", "user", "pass",
+                                   "one.com", state_file)
+            second = MTFSSProcessor("imap.two.com", "user", "pass",
+                                    "two.com", state_file)
+
+            first._uid_state = {'1': 10}
+            first._save_state()
+            second._uid_state = {'1': 99}
+            second._save_state()
+
+            reloaded = MTFSSProcessor("imap.one.com", "user", "pass",
+                                      "one.com", state_file)
+            self.assertEqual(reloaded._uid_state, {'1': 10})
+            self.assertEqual(second._load_state(), {'1': 99})
+
+    def test_process_inbox_fetch_batches(self):
+        """Test large inboxes are fetched in fixed-size batches."""
+        ids = b' '.join(str(i).encode() for i in range(1, 151))
+        self.mock_connection.search.return_value = ('OK', [ids])
+        self.mock_connection.create.return_value = ('OK', [])
+        self.mock_connection.fetch.return_value = ('OK', [])
+
+        self.processor.process_inbox()
+
+        self.assertEqual(self.mock_connection.fetch.call_count, 2)
+        first, second = self.mock_connection.fetch.call_args_list
+        self.assertEqual(
+            first.args[0], b','.join(str(i).encode() for i in range(1, 101)))
+        self.assertEqual(
+            second.args[0], b','.join(str(i).encode() for i in range(101, 151)))
+
+    def test_process_inbox_fetch_error_propagates(self):
+        """Test unexpected errors on the fetch thread reach the caller."""
+        self.mock_connection.search.return_value = ('OK', [b'1 2 3'])
+        self.mock_connection.create.return_value = ('OK', [])
+        self.mock_connection.fetch.side_effect = OSError("Connection reset")
+
+        with pytest.raises(OSError):
+            self.processor.process_inbox()
+
+        self.mock_connection.copy.assert_not_called()
+        self.mock_connection.expunge.assert_not_called()
+
+    def test_process_inbox_fetch_abort_stops_pass(self):
+        """Test a dropped connection ends the pass instead of retrying."""
+        ids = b' '.join(str(i).encode() for i in range(1, 151))
+        self.mock_connection.search.return_value = ('OK', [ids])
+        self.mock_connection.create.return_value = ('OK', [])
+        self.mock_connection.fetch.side_effect = IMAP4.abort("socket error")
+
+        with pytest.raises(IMAP4.abort):
+            self.processor.process_inbox()
+
+        self.mock_connection.fetch.assert_called_once()
+        self.mock_connection.expunge.assert_not_called()
+
+    def test_flush_moves_abort_propagates(self):
+        """Test a dropped connection while moving is not swallowed."""
+        self.mock_connection.copy.side_effect = IMAP4.abort("socket error")
+
+        with patch.object(self.processor, 'folder_exists', return_value=True):
+            self.processor._plan_move(b'1', 'Inbox.John')
+            with pytest.raises(IMAP4.abort):
+                self.processor._flush_moves()
+
     def test_process_inbox_no_messages(self):
         """Test processing empty inbox."""
         self.mock_connection.select.return_value = ('OK', [])
@@ -303,6 +649,166 @@ class TestMTFSSProcessor(unittest.TestCase):
         # Should not call expunge for empty inbox
         self.mock_connection.expunge.assert_called_once()
 
+    @patch('mtfss.select.select')
+    def test_wait_for_mail_new_message(self, mock_select):
+        """Test IDLE returns once the server announces new mail."""
+        self.mock_connection._new_tag.return_value = b'A1'
+        self.mock_connection.tagged_commands = {b'A1': None}
+        self.mock_connection.untagged_responses = {}
+        self.mock_connection.file.peek.return_value = b''
+        self.mock_connection.readline.side_effect = [
+            b'+ idling\r\n',
+            b'* 4 EXPUNGE\r\n',
+            b'* 5 EXISTS\r\n',
+            b'* 1 RECENT\r\n',
+            b'A1 OK IDLE terminated\r\n',
+        ]
+        mock_select.return_value = ([self.mock_connection.sock], [], [])
+
+        self.assertTrue(self.processor.wait_for_mail(60))
+
+        self.assertEqual(self.mock_connection.send.call_args_list,
+                         [call(b'A1 IDLE\r\n'), call(b'DONE\r\n')])
+        self.assertEqual(self.mock_connection.tagged_commands, {})
+
+    @patch('mtfss.select.select')
+    def test_wait_for_mail_exists_with_continuation(self, mock_select):
+        """Test EXISTS read together with the continuation is not missed."""
+        conn = self.mock_connection
+        conn._new_tag.return_value = b'A1'
+        conn.tagged_commands = {b'A1': None}
+        conn.untagged_responses = {}
+        conn.file = io.BufferedReader(io.BytesIO(
+            b'+ idling\r\n* 5 EXISTS\r\nA1 OK IDLE terminated\r\n'))
+        conn.readline.side_effect = conn.file.readline
+        # Everything has been read off the socket and out of the SSL layer
+        conn.sock.pending.return_value = 0
+        mock_select.return_value = ([], [], [])
+
+        self.assertTrue(self.processor.wait_for_mail(60))
+
+        mock_select.assert_not_called()
+        self.assertEqual(conn.send.call_args_list,
+                         [call(b'A1 IDLE\r\n'), call(b'DONE\r\n')])
+
+    @patch('mtfss.select.select')
+    def test_wait_for_mail_exists_before_continuation(self, mock_select):
+        """Test EXISTS sent ahead of the continuation ends IDLE at once."""
+        self.mock_connection._new_tag.return_value = b'A1'
+        self.mock_connection.tagged_commands = {b'A1': None}
+        self.mock_connection.untagged_responses = {}
+        self.mock_connection.readline.side_effect = [
+            b'* 5 EXISTS\r\n',
+            b'+ idling\r\n',
+            b'A1 OK IDLE terminated\r\n',
+        ]
+
+        self.assertTrue(self.processor.wait_for_mail(60))
+
+        mock_select.assert_not_called()
+        self.assertEqual(self.mock_connection.send.call_args_list,
+                         [call(b'A1 IDLE\r\n'), call(b'DONE\r\n')])
+
+    def test_wait_for_mail_pending_exists(self):
+        """Test EXISTS received before IDLE is reported without idling."""
+        self.mock_connection.untagged_responses = {'EXISTS': [b'5']}
+
+        self.assertTrue(self.processor.wait_for_mail(60))
+
+        self.mock_connection.send.assert_not_called()
+        self.assertEqual(self.mock_connection.untagged_responses, {})
+
+    @patch('mtfss.select.select')
+    def test_wait_for_mail_timeout(self, mock_select):
+        """Test IDLE is ended cleanly when no mail arrives."""
+        self.mock_connection._new_tag.return_value = b'A1'
+        self.mock_connection.tagged_commands = {b'A1': None}
+        self.mock_connection.untagged_responses = {}
+        self.mock_connection.file.peek.return_value = b''
+        self.mock_connection.readline.side_effect = [
+            b'+ idling\r\n',
+            b'A1 OK IDLE terminated\r\n',
+        ]
+        mock_select.return_value = ([], [], [])
+
+        self.assertFalse(self.processor.wait_for_mail(60))
+        self.mock_connection.send.assert_called_with(b'DONE\r\n')
+
+    @patch('mtfss.time.sleep')
+    def test_run_continuous_backoff(self, mock_sleep):
+        """Test reconnection attempts back off and reset after success."""
+        self.processor.connection = None
+        mock_sleep.side_effect = [None, None, None, KeyboardInterrupt]
+
+        with patch.object(self.processor, 'connect',
+                          side_effect=[False, False, True, True]), \
+                patch.object(self.processor, 'process_inbox',
+                             side_effect=[IMAP4.abort("gone"), None]):
+            self.processor.run_continuous(30)
+
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list],
+                         [1, 2, 4, 30])
+
+    @patch('mtfss.time.sleep')
+    @patch('mtfss.PipelinedIMAP4_SSL')
+    def test_run_continuous_backoff_on_login_failure(self, mock_imap,
+                                                     mock_sleep):
+        """Test failed logins back off instead of reusing the connection."""
+        self.processor.connection = None
+        connection = mock_imap.return_value
+        connection.login.side_effect = [
+            IMAP4.error("[UNAVAILABLE] Try again later"),
+            IMAP4.error("[UNAVAILABLE] Try again later"),
+            ('OK', [])]
+        connection.capability.return_value = ('OK', [b'IMAP4rev1'])
+        mock_sleep.side_effect = [None, None, KeyboardInterrupt]
+
+        with patch.object(self.processor, 'process_inbox') as process_inbox:
+            self.processor.run_continuous(30)
+
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list],
+                         [1, 2, 30])
+        process_inbox.assert_called_once()
+        self.assertEqual(connection.shutdown.call_count, 2)
+
+    @patch('mtfss.time.sleep')
+    def test_run_continuous_drops_aborted_connection(self, mock_sleep):
+        """Test an aborted connection is discarded so it is reopened."""
+        mock_sleep.side_effect = KeyboardInterrupt
+
+        with patch.object(self.processor, 'process_inbox',
+                          side_effect=IMAP4.abort("socket error")):
+            self.processor.run_continuous(30)
+
+        self.mock_connection.shutdown.assert_called_once()
+        self.assertIsNone(self.processor.connection)
+
+
+class TestPipelinedIMAP4(unittest.TestCase):
+    """Test cases for command pipelining."""
+
+    def test_pipeline_sends_before_reading(self):
+        """Test every command is sent before any reply is read."""
+        conn = PipelinedIMAP4_SSL.__new__(PipelinedIMAP4_SSL)
+        events = Mock()
+        events._command.side_effect = [b'A1', b'A2', b'A3']
+        events._command_complete.side_effect = [
+            ('OK', [b'done']),
+            PipelinedIMAP4_SSL.error('UID command error: BAD'),
+            ('NO', [b'no such folder']),
+        ]
+        conn._command = events._command
+        conn._command_complete = events._command_complete
+
+        results = conn.pipeline(('UID', 'COPY', '1', 'a'),
+                                ('UID', 'COPY', '2', 'b'),
+                                ('UID', 'COPY', '3', 'c'))
+
+        self.assertEqual([name for name, _, _ in events.mock_calls],
+                         ['_command'] * 3 + ['_command_complete'] * 3)
+        events._command_complete.assert_called_with('UID', b'A3')
+        self.assertEqual([status for status, _ in results], ['OK', 'BAD', 'NO'])
+
 
 class TestEmailParsing(unittest.TestCase):
     """Test cases for email parsing edge cases."""
@@ -322,6 +828,7 @@ class TestEmailParsing(unittest.TestCase):
             ("user.name@sub.domain.com", ("user.name", "sub.domain.com")),
             ("user123@test-domain.org", ("user123", "test-domain.org")),
             ("user_name@example.co.uk", ("user_name", "example.co.uk")),
+            ('"at@local"@example.com', ('"at@local"', "example.com")),
         ]
 
         for email_addr, expected in test_cases:
@@ -347,6 +854,76 @@ class TestEmailParsing(unittest.TestCase):
         self.assertEqual(user, "user")
         self.assertEqual(domain, "münchen.de")
 
+    def test_scan_recipient_headers(self):
+        """Test scanning raw headers for folded To, Cc and Bcc values."""
+        raw = (b'Cc: carol@example.com\r\n'
+               b'Subject: To: nobody@example.com\r\n'
+               b'TO: alice@example.com,\r\n'
+               b'\tbob@example.com\r\n'
+               b'Bcc: dave@example.com\r\n'
+               b'\r\n'
+               b'To: body@example.com\r\n')
+
+        self.assertEqual(_scan_recipient_headers(raw), [
+            b'alice@example.com,\tbob@example.com',
+            b'carol@example.com',
+            b'dave@example.com',
+        ])
+
+    def test_scan_recipient_headers_none(self):
+        """Test scanning headers without any recipients."""
+        self.assertEqual(_scan_recipient_headers(b''), [])
+        self.assertEqual(
+            _scan_recipient_headers(b'From: sender@example.com\r\n\r\n'), [])
+
+    def test_simple_addresses(self):
+        """Test plain address lists are split without the full parser."""
+        self.assertEqual(
+            _simple_addresses(b'a@example.com, Bob <b@example.com>,\t<c@test.org>'),
+            ['a@example.com', 'b@example.com', 'c@test.org'])
+        self.assertEqual(_simple_addresses(b'=?utf-8?q?J=C3=B6rg?= <j@example.com>'),
+                         ['j@example.com'])
+        self.assertEqual(_simple_addresses(b''), [])
+
+        for value in (b'"Smith, John" <john@example.com>',
+                      b'john@example.com (John)',
+                      b'Team: a@example.com;',
+                      b'john smith@example.com',
+                      b'<a@example.com> trailing',
+                      b'a@, real@x.com',
+                      b'x@y@z.com',
+                      b'[a@b.com]',
+                      b'j@x.com <k@y.com>'):
+            with self.subTest(value=value):
+                self.assertIsNone(_simple_addresses(value))
+
+    def test_header_recipients_matches_getaddresses(self):
+        """Test the fast path agrees with getaddresses."""
+        values = [b'a@example.com, Bob <b@example.com>',
+                  b'"Smith, John" <john@example.com>, undisclosed-recipients:;',
+                  b'Support Team <support@company.com>',
+                  b'user@m\xc3\xbcnchen.de',
+                  b'a@, real@x.com',
+                  b'x@y@z.com',
+                  b'[a@b.com]',
+                  b'j@x.com <k@y.com>',
+                  b'a@example.com,, <b@example.com>,']
+
+        self.assertEqual(
+            _header_recipients(values),
+            _recipient_addresses([v.decode('utf-8') for v in values]))
+
+    def test_pathological_recipient_headers(self):
+        """Test huge and separator-stuffed headers are handled in linear time."""
+        raw = (b'To: ' + b';' * 100000 + b' first@example.com\r\n'
+               b'Cc: a@example.com,\r\n' + b'\tb@example.com,\r\n' * 50000)
+
+        values = _scan_recipient_headers(raw)
+        recipients = _recipient_addresses([v.decode() for v in values])
+
+        self.assertEqual(recipients[0], 'first@example.com')
+        self.assertEqual(len(recipients), 50002)
+
 
 class TestArchiveFunctionality(unittest.TestCase):
     """Test cases for archive functionality."""
@@ -356,6 +933,7 @@ class TestArchiveFunctionality(unittest.TestCase):
         self.processor = MTFSSProcessor(
             "imap.test.com", "user", "pass", "test.com")
         self.mock_connection = Mock()
+        mock_imap_commands(self.mock_connection)
         self.processor.connection = self.mock_connection
 
     def test_archive_folder_detection(self):